@@ -1,6 +1,16 @@
 from .install import Installer
 
 
-def update(package_name: str, entrypoint_name: str = "") -> None:
-    installer = Installer(package=package_name, entrypoint_name=entrypoint_name)
+def update(
+    package_name: str,
+    entrypoint_name: str = "",
+    only_binary: bool = False,
+    use_uv: bool = False,
+) -> None:
+    installer = Installer(
+        package=package_name,
+        entrypoint_name=entrypoint_name,
+        only_binary=only_binary,
+        use_uv=use_uv,
+    )
     installer.update()
@@ -6,9 +6,16 @@
 
 import sys
 import os
-import subprocess
 import re
-import shutil
+
+# The rest of the standard library modules we need are imported where they're used,
+# so that the script can get through argument parsing and preflight checks quickly
+# (including typing, which is only needed by type checkers)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import subprocess
+    from typing import List, Optional, Set
 
 
 class Abort(Exception):
@@ -18,25 +25,53 @@ class Abort(Exception):
 class Installer:
     VENV_NAME = ".venv"
     REQUIREMENTS_FILE = "requirements.txt"
+    # Stored inside the venv so it goes away with it
+    REQUIREMENTS_HASH_FILE = ".barrel_req_hash"
+
+    # Compiled once instead of going through the re cache on every call
+    VERSION_SPECIFIER_RE = re.compile(r"(?<!\\)[><~^=]")
+    NAME_SEPARATOR_RE = re.compile(r"[-_.]+")
 
     # Installation modes
     MODE_CREATE = "create"
     MODE_INSTALL = "install"
     MODE_UPDATE = "update"
     MODE_REINSTALL = "reinstall"
+    MODE_UP_TO_DATE = "up-to-date"
+
+    # Output formats
+    FORMAT_BOLD = "\033[1m{}\033[0m\n"
+    FORMAT_YELLOW = "\033[33m{}\033[0m\n"
+    FORMAT_RED = "\033[31m{}\033[0m\n"
+    FORMAT_GREEN = "\033[32m{}\033[0m\n"
 
     def __init__(
-        self, package: str, entrypoint_name: str = "", debug: bool = False
+        self,
+        package: str,
+        entrypoint_name: str = "",
+        debug: bool = False,
+        only_binary: bool = False,
+        use_uv: bool = False,
     ) -> None:
         self.package_input = package
         self.debug = debug
+        self.only_binary = only_binary
+        self.use_uv = self.find_uv(use_uv or os.environ.get("BARREL_USE_UV") == "1")
         self.package_name = self.parse_package_name(self.package_input)
         self.entrypoint_name = entrypoint_name or self.package_name
+        self.venv_path = os.path.abspath(self.VENV_NAME)
+
+        # Windows venvs use Scripts instead of bin
+        self.venv_bin_path = os.path.join(
+            self.VENV_NAME, "Scripts" if os.name == "nt" else "bin"
+        )
+        self.pip_path = os.path.join(self.venv_bin_path, "pip")
+        self.python_path = os.path.join(self.venv_bin_path, "python")
 
     def parse_package_name(self, package_input: str) -> str:
         package_name = ""
 
-        package_parts = re.split(r"(?<!\\)[><~^=]", package_input)
+        package_parts = self.VERSION_SPECIFIER_RE.split(package_input)
         if len(package_parts) == 1:
             package_name = package_parts[0]
             if "/" in package_name:
@@ -73,6 +108,13 @@ class Installer:
                 return self.MODE_UPDATE
             elif reinstall:
                 return self.MODE_REINSTALL
+            elif (
+                self.package_input == self.package_name
+                and self.requirements_hash_matches()
+            ):
+                # Nothing has changed since the last install
+                # (and no specific version was asked for, which could be different)
+                return self.MODE_UP_TO_DATE
             else:
                 self.error(f"Use --reinstall or --update in an existing installation")
                 raise Abort()
@@ -90,14 +132,27 @@ class Installer:
             self.update()
         elif mode == self.MODE_REINSTALL:
             self.reinstall()
+        elif mode == self.MODE_UP_TO_DATE:
+            self.up_to_date()
 
     def create(self) -> None:
         """Creates .venv and requirements.txt"""
+        import tempfile
+
         self.preflight(requirements_should_exist=False)
         self.event(f"Setting up {self.package_input} in this directory")
 
-        self.create_venv()
-        self.pip_install()
+        with tempfile.TemporaryDirectory() as download_dir:
+            # Download the packages while the venv is being created, so the install
+            # gets its files from pip's (shared) cache instead of the network
+            download = self.start_download(download_dir, self.package_input)
+            try:
+                self.create_venv()
+                find_links = self.finish_download(download, download_dir)
+            finally:
+                self.stop_download(download)
+
+            self.pip_install(find_links=find_links)
 
         package_installed = self.get_installed_package()
 
@@ -106,6 +161,7 @@ class Installer:
             raise Abort()
 
         self.save_requirements(package_installed)
+        self.save_requirements_hash()
 
         self.check_path()
         self.check_gitignore()
@@ -114,11 +170,24 @@ class Installer:
 
     def install(self) -> None:
         """Installs existing requirements.txt"""
+        import tempfile
+
         self.preflight(requirements_should_exist=True)
         self.event(f"Installing {self.package_input} into this directory")
 
-        self.create_venv()
-        self.pip_install_requirements()
+        with tempfile.TemporaryDirectory() as download_dir:
+            # Download the packages while the venv is being created, so the install
+            # gets its files from pip's (shared) cache instead of the network
+            download = self.start_download(download_dir, "-r", self.REQUIREMENTS_FILE)
+            try:
+                self.create_venv()
+                find_links = self.finish_download(download, download_dir)
+            finally:
+                self.stop_download(download)
+
+            self.pip_install_requirements(find_links=find_links)
+
+        self.save_requirements_hash()
 
         package_installed = self.get_installed_package()
 
@@ -127,6 +196,22 @@ class Installer:
 
         self.success(f"\nSuccessfully installed {package_installed}!")
 
+    def up_to_date(self) -> None:
+        """Checks an existing install of an unchanged requirements.txt (without pip)"""
+        self.preflight(requirements_should_exist=True)
+
+        package_installed = self.get_installed_package()
+
+        if not package_installed:
+            # The venv has a different package in it
+            self.error(f"Use --reinstall or --update in an existing installation")
+            raise Abort()
+
+        self.check_path()
+        self.check_gitignore()
+
+        self.success(f"{package_installed} is already installed and up to date")
+
     def reinstall(self) -> None:
         self.preflight(requirements_should_exist=False)
         self.event(f"Re-installing {self.package_input} into this directory")
@@ -152,81 +237,262 @@ class Installer:
             raise Abort()
 
         self.save_requirements(package_installed)
+        self.save_requirements_hash()
 
         self.success(f"\nSuccessfully updated {package_installed}!")
 
     def preflight(self, requirements_should_exist: bool) -> None:
-        if os.path.exists("pyproject.toml") or os.path.exists("poetry.lock"):
+        # One directory read instead of a stat for every file we look for
+        filenames = set(os.listdir("."))
+
+        if "pyproject.toml" in filenames or "poetry.lock" in filenames:
             print(
                 "It looks like you are using Poetry for dependencies. Use the `poetry update` command instead."
             )
             raise Abort()
 
-        if os.path.exists("Pipfile") or os.path.exists("Pipfile.lock"):
+        if "Pipfile" in filenames or "Pipfile.lock" in filenames:
             print(
                 "It looks like you are using Pipenv for dependencies. Use the `pipenv update` command instead."
             )
             raise Abort()
 
-        if os.path.exists("requirements.in"):
+        if "requirements.in" in filenames:
             print(
                 "It looks like you are using pip-compile for dependencies. Use the `pip-compile requirements.in` command instead."
             )
             raise Abort()
 
-        if os.path.exists("setup.py"):
+        if "setup.py" in filenames:
             print(
                 "It looks like you are using setuptools for dependencies. Use the `python setup.py install` command instead."
             )
             raise Abort()
 
-        if requirements_should_exist and not os.path.exists(
-            Installer.REQUIREMENTS_FILE
-        ):
+        if requirements_should_exist and self.REQUIREMENTS_FILE not in filenames:
             print(
                 f"A {self.REQUIREMENTS_FILE} file does not exist, which likely means that you aren't updating a barrel-compatible installation or aren't in the right directory."
             )
             raise Abort()
 
     def in_venv(self) -> bool:
-        return sys.executable.startswith(os.path.abspath(self.VENV_NAME) + os.sep)
+        # sys.prefix is the venv directory when running inside of one
+        if sys.prefix == self.venv_path:
+            return True
+
+        # The paths can still differ by a symlink
+        return (
+            sys.prefix != sys.base_prefix
+            and os.path.isdir(self.venv_path)
+            and os.path.samefile(sys.prefix, self.venv_path)
+        )
 
     def entrypoint_available(self) -> bool:
-        which = shutil.which(self.entrypoint_name)
-        if not which:
+        # We know where the entrypoint should be, so check that directly
+        # instead of searching all of PATH for it
+        bin_path = os.path.abspath(self.venv_bin_path)
+        entrypoint_path = os.path.join(bin_path, self.entrypoint_name)
+        if os.name == "nt":
+            entrypoint_path += ".exe"
+        is_executable = os.path.isfile(entrypoint_path) and os.access(
+            entrypoint_path, os.X_OK
+        )
+        if not is_executable:
             return False
 
-        rel = os.path.relpath(which)
-        return rel.startswith(self.VENV_NAME)
+        path_dirs = os.environ.get("PATH", "").split(os.pathsep)
+        return bin_path in (os.path.abspath(d) for d in path_dirs if d)
 
     def remove_existing_venv(self) -> None:
+        import shutil
+        import subprocess
+
         if os.path.exists(self.VENV_NAME):
             self.event(f"  - Removing existing {self.VENV_NAME}")
+
+            if os.name == "posix":
+                # rm is a lot faster than rmtree on thousands of small files
+                try:
+                    subprocess.check_call(
+                        ["rm", "-rf", self.VENV_NAME], close_fds=False
+                    )
+                    return
+                except (OSError, subprocess.CalledProcessError):
+                    pass
+
             shutil.rmtree(self.VENV_NAME)
 
     def create_venv(self) -> None:
+        import subprocess
+
         self.event(f"- Creating a virtual environment at {self.VENV_NAME}")
-        subprocess.check_call([sys.executable, "-m", "venv", self.VENV_NAME])
 
-    def pip_install(self) -> None:
-        self.event(f"- Installing {self.package_input} with {self.VENV_NAME}/bin/pip")
-        subprocess.check_call(
-            [f"{self.VENV_NAME}/bin/pip", "install", self.package_input],
-            stdout=sys.stdout if self.debug else subprocess.DEVNULL,
+        if self.use_uv:
+            # The venv module bootstraps pip with ensurepip, which is the slowest part.
+            # uv seeds pip from its own cache instead (the venv still needs its own pip
+            # so the package can update itself later).
+            subprocess.check_call(
+                [
+                    "uv",
+                    "venv",
+                    *self.quiet_args(),
+                    "--seed",
+                    "--python",
+                    sys.executable,
+                    self.VENV_NAME,
+                ],
+                stdout=sys.stdout if self.debug else subprocess.DEVNULL,
+                close_fds=False,
+            )
+        else:
+            subprocess.check_call(
+                [sys.executable, "-m", "venv", self.VENV_NAME], close_fds=False
+            )
+
+    def start_download(
+        self, download_dir: str, *args: str
+    ) -> "Optional[subprocess.Popen[bytes]]":
+        """Download packages with the pip we're running under (if there is one)"""
+        import importlib.util
+        import subprocess
+
+        if self.use_uv or importlib.util.find_spec("pip") is None:
+            # uv already downloads in parallel on its own
+            return None
+
+        if self.debug:
+            # Running alongside the venv creation would interleave the output
+            return None
+
+        return subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "pip",
+                "download",
+                *self.quiet_args(),
+                *self.binary_args(uv=False),
+                "--dest",
+                download_dir,
+                *args,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=False,
+        )
+
+    def finish_download(
+        self, download: "Optional[subprocess.Popen[bytes]]", download_dir: str
+    ) -> str:
+        """Returns the directory to install from, or empty to use the index like normal"""
+        if download is not None and download.wait() == 0:
+            return download_dir
+
+        return ""
+
+    def stop_download(self, download: "Optional[subprocess.Popen[bytes]]") -> None:
+        """Make sure the download isn't still writing to a directory we're about to delete"""
+        if download is not None and download.poll() is None:
+            download.kill()
+            download.wait()
+
+    def find_uv(self, requested: bool) -> bool:
+        # uv resolves, downloads, and installs in parallel (and starts faster than pip),
+        # but it's opt-in because it doesn't read pip's config (ex. a private index URL)
+        if not requested:
+            return False
+
+        import shutil
+
+        if shutil.which("uv") is None:
+            self.warn("uv was requested but is not in PATH, using pip instead")
+            return False
+
+        return True
+
+    def pip_name(self) -> str:
+        return "uv" if self.use_uv else self.pip_path
+
+    def pip_install_command(self, *args: str) -> "List[str]":
+        if self.use_uv:
+            return [
+                "uv",
+                "pip",
+                "install",
+                "--python",
+                self.python_path,
+                *self.quiet_args(),
+                *self.binary_args(uv=True),
+                *args,
+            ]
+
+        return [
+            self.pip_path,
+            "install",
+            *self.quiet_args(),
+            *self.binary_args(uv=False),
+            *args,
+        ]
+
+    def quiet_args(self) -> "List[str]":
+        if self.debug:
+            # Output goes straight to our stdout file descriptor
+            return []
+
+        # Informational output goes to stdout, which gets thrown away,
+        # so don't make pip/uv generate it (warnings and errors still go to stderr)
+        return ["--quiet"]
+
+    def binary_args(self, uv: bool) -> "List[str]":
+        args = []
+
+        if not uv:
+            # Use a wheel when one is available, even if an sdist is newer,
+            # so we don't have to build anything
+            args.append("--prefer-binary")
+
+        if self.only_binary:
+            # Never build from source
+            args.append("--only-binary=:all:")
+
+        return args
+
+    def find_links_args(self, find_links: str) -> "List[str]":
+        if not find_links:
+            return []
+
+        # pip still checks the index for every requirement (and gets anything that
+        # wasn't downloaded, like build dependencies for an sdist), but the files
+        # themselves come from here or from the HTTP cache the download warmed up
+        return ["--find-links", find_links]
+
+    def pip_install(self, find_links: str = "") -> None:
+        self.event(f"- Installing {self.package_input} with {self.pip_name()}")
+        self.run_pip_install(
+            self.pip_install_command(
+                *self.find_links_args(find_links), self.package_input
+            )
         )
 
-    def pip_install_requirements(self) -> None:
+    def pip_install_requirements(self, find_links: str = "") -> None:
         self.event(f"- Installing {self.REQUIREMENTS_FILE}")
-        subprocess.check_call(
-            [f"{self.VENV_NAME}/bin/pip", "install", "-r", self.REQUIREMENTS_FILE],
-            stdout=sys.stdout if self.debug else subprocess.DEVNULL,
+        self.run_pip_install(
+            self.pip_install_command(
+                *self.find_links_args(find_links), "-r", self.REQUIREMENTS_FILE
+            )
         )
 
     def pip_update(self) -> None:
-        self.event(f"- Updating {self.package_input} with {self.VENV_NAME}/bin/pip")
+        self.event(f"- Updating {self.package_input} with {self.pip_name()}")
+        self.run_pip_install(self.pip_install_command("-U", self.package_input))
+
+    def run_pip_install(self, command: "List[str]") -> None:
+        import subprocess
+
         subprocess.check_call(
-            [f"{self.VENV_NAME}/bin/pip", "install", "-U", self.package_input],
+            command,
             stdout=sys.stdout if self.debug else subprocess.DEVNULL,
+            close_fds=False,
         )
 
     def save_requirements(self, package_installed: str) -> None:
@@ -238,6 +504,28 @@ class Installer:
             # as part of the point of this is to *simplify* the process
             # (the downside to this is that transitive dependencies can and will change without notice)
 
+    def requirements_hash(self) -> str:
+        import hashlib
+
+        with open(self.REQUIREMENTS_FILE, "rb") as f:
+            return hashlib.blake2b(f.read()).hexdigest()
+
+    def save_requirements_hash(self) -> None:
+        """Remember what was installed so an unchanged install can be skipped next time"""
+        with open(os.path.join(self.VENV_NAME, self.REQUIREMENTS_HASH_FILE), "w") as f:
+            f.write(self.requirements_hash())
+
+    def requirements_hash_matches(self) -> bool:
+        try:
+            with open(os.path.join(self.VENV_NAME, self.REQUIREMENTS_HASH_FILE)) as f:
+                saved_hash = f.read().strip()
+        except FileNotFoundError:
+            return False
+
+        return os.path.exists(self.REQUIREMENTS_FILE) and (
+            saved_hash == self.requirements_hash()
+        )
+
     def check_path(self) -> None:
         if not self.entrypoint_available():
             self.warn(
@@ -245,55 +533,128 @@ class Installer:
             )
 
     def check_gitignore(self) -> None:
+        if not os.path.exists(".git"):
+            return
+
+        gitignore_lines = self.read_gitignore_lines()
         if (
-            os.path.exists(".git")
-            and not self.gitignore_contains(self.VENV_NAME)
-            and not self.gitignore_contains("/" + self.VENV_NAME)
+            self.VENV_NAME.lower() not in gitignore_lines
+            and ("/" + self.VENV_NAME).lower() not in gitignore_lines
         ):
             self.warn(
                 f"- You should add {self.VENV_NAME} to your .gitignore so that it is not tracked by git"
             )
 
-    def gitignore_contains(self, text: str) -> bool:
+    def read_gitignore_lines(self) -> "Set[str]":
+        """Normalized lines of .gitignore, read once so we can check several patterns"""
         if not os.path.exists(".gitignore"):
-            return False
+            return set()
 
         with open(".gitignore") as f:
-            for line in f:
-                if line.strip().lower() == text.lower():
-                    return True
-
-        return False
+            return {line.strip().lower() for line in f}
 
     def get_installed_package(self) -> str:
-        for line in (
-            subprocess.check_output([f"{self.VENV_NAME}/bin/pip", "freeze"])
-            .decode("utf-8")
-            .splitlines()
-        ):
-            if re.match(r"^{}\W+".format(self.package_name), line.lower()):
-                return line
+        """Read the installed version straight from the venv metadata (no pip process)"""
+        import glob
+
+        package_key = self.normalize_package_name(self.package_name)
+
+        if os.name == "nt":
+            site_packages = os.path.join(self.VENV_NAME, "Lib", "site-packages")
+        else:
+            # lib/python3.X on CPython, lib/pypy3.X on PyPy
+            site_packages = os.path.join(self.VENV_NAME, "lib", "*", "site-packages")
+        metadata_paths = glob.glob(
+            os.path.join(site_packages, "*.dist-info", "METADATA")
+        ) + glob.glob(os.path.join(site_packages, "*.egg-info", "PKG-INFO"))
+
+        for metadata_path in metadata_paths:
+            # The directory is named "<name>-<version>.dist-info",
+            # so we can skip other packages without opening their metadata
+            dist_dir = os.path.basename(os.path.dirname(metadata_path))
+            dist_name = os.path.splitext(dist_dir)[0].split("-", 1)[0]
+            if self.normalize_package_name(dist_name) != package_key:
+                continue
+
+            name = ""
+            version = ""
+
+            with open(metadata_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        # End of the headers
+                        break
+                    if line.startswith("Name: "):
+                        name = line[len("Name: ") :].strip()
+                    elif line.startswith("Version: "):
+                        version = line[len("Version: ") :].strip()
+
+            if name and version and self.normalize_package_name(name) == package_key:
+                direct_url = self.read_direct_url(os.path.dirname(metadata_path))
+                if direct_url:
+                    # Installed from a path or URL, which is what pip freeze would pin
+                    return f"{name} @ {direct_url}"
+
+                return f"{name}=={version}"
 
         return ""
 
+    def read_direct_url(self, dist_info_path: str) -> str:
+        """The PEP 440 direct reference from direct_url.json (PEP 610), if there is one"""
+        import json
+
+        try:
+            with open(os.path.join(dist_info_path, "direct_url.json")) as f:
+                direct_url = json.load(f)
+        except (OSError, ValueError):
+            return ""
+
+        url = direct_url.get("url", "")
+        if not url:
+            return ""
+
+        # Same format as pip freeze
+        fragments = []
+
+        if "vcs_info" in direct_url:
+            vcs_info = direct_url["vcs_info"]
+            url = f"{vcs_info['vcs']}+{url}@{vcs_info['commit_id']}"
+        elif direct_url.get("archive_info", {}).get("hash"):
+            fragments.append(direct_url["archive_info"]["hash"])
+
+        if direct_url.get("subdirectory"):
+            fragments.append("subdirectory=" + direct_url["subdirectory"])
+
+        if fragments:
+            url += "#" + "&".join(fragments)
+
+        return url
+
+    def normalize_package_name(self, name: str) -> str:
+        # https://peps.python.org/pep-0503/#normalized-names
+        return self.NAME_SEPARATOR_RE.sub("-", name).lower()
+
     def confirm(self, prompt: str) -> bool:
-        return "y" in input(prompt).lower()
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
+        # Only the first character matters ("y", "Y", "yes"...)
+        return sys.stdin.readline()[:1] in ("y", "Y")
 
     def event(self, text: str) -> None:
         """Print in bold if we're in deubg (so regular output is distinguished)"""
         if self.debug:
-            print("\033[1m" + text + "\033[0m")
+            sys.stdout.write(self.FORMAT_BOLD.format(text))
         else:
-            print(text)
+            sys.stdout.write(text + "\n")
 
     def warn(self, text: str) -> None:
-        print("\033[33m" + text + "\033[0m")
+        sys.stdout.write(self.FORMAT_YELLOW.format(text))
 
     def error(self, text: str) -> None:
-        print("\033[31m" + text + "\033[0m")
+        sys.stdout.write(self.FORMAT_RED.format(text))
 
     def success(self, text: str) -> None:
-        print("\033[32m" + text + "\033[0m")
+        sys.stdout.write(self.FORMAT_GREEN.format(text))
 
 
 if __name__ == "__main__":
@@ -323,6 +684,18 @@ if __name__ == "__main__":
     else:
         debug = False
 
+    if "--only-binary" in sys.argv:
+        sys.argv.remove("--only-binary")
+        only_binary = True
+    else:
+        only_binary = False
+
+    if "--uv" in sys.argv:
+        sys.argv.remove("--uv")
+        use_uv = True
+    else:
+        use_uv = False
+
     if "--entrypoint" in sys.argv:
         entrypoint_name = sys.argv[sys.argv.index("--entrypoint") + 1]
         sys.argv.remove("--entrypoint")
@@ -332,7 +705,13 @@ if __name__ == "__main__":
 
     package = sys.argv[1]
 
-    installer = Installer(package=package, entrypoint_name=entrypoint_name, debug=debug)
+    installer = Installer(
+        package=package,
+        entrypoint_name=entrypoint_name,
+        debug=debug,
+        only_binary=only_binary,
+        use_uv=use_uv,
+    )
     try:
         installer.run(reinstall=reinstall, update=update)
     except Abort: